@@ -12,4 +12,13 @@ celery = Celery(
 
 celery.conf.update(
     task_track_started=True,
+    # Only the artifact-gc service runs beat (worker -B on gc_queue), so
+    # collection never takes a slot from live asset jobs.
+    beat_schedule={
+        "artifact-gc": {
+            "task": "artifact_gc_task",
+            "schedule": settings.GC_INTERVAL_SECONDS,
+            "options": {"queue": "gc_queue"},
+        },
+    },
 )
\ No newline at end of file
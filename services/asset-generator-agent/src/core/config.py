@@ -29,6 +29,53 @@ class Settings(BaseSettings):
     ELEVENLABS_API_KEY: Optional[str] = Field(default=None)
     ELEVENLABS_VOICE_ID: Optional[str] = Field(default="21m00Tcm4TlvDq8ikWAM")
 
+    # --- Chunked voiceover (opt-in) ---
+    TTS_CHUNKED_ENABLED: bool = Field(default=False)
+    # Concurrent ElevenLabs requests across all worker processes on the node
+    # (every TTS request, chunked or not); keep within your plan's limit.
+    TTS_MAX_CONCURRENCY: int = Field(default=3)
+    TTS_SLOT_DIR: str = Field(default="/tmp/tts_slots")
+    TTS_SLOT_POLL_SECONDS: float = Field(default=0.5)
+    # Failed requests (e.g. 429s) are retried with exponential backoff.
+    TTS_MAX_RETRIES: int = Field(default=3)
+    TTS_RETRY_BACKOFF_SECONDS: float = Field(default=2.0)
+    TTS_CROSSFADE_SECONDS: float = Field(default=0.03)
+
+    VEO_MODEL: str = Field(default="veo-2.0-generate-001")
+    VEO_POLL_SECONDS: int = Field(default=20)
+
+    # --- Hedged Veo renders (opt-in) ---
+    # A duplicate operation is submitted once a render runs longer than this
+    # percentile of recent render times for the same model.
+    VEO_HEDGING_ENABLED: bool = Field(default=False)
+    VEO_HEDGE_PERCENTILE: float = Field(default=90.0)
+    VEO_HEDGE_MIN_SAMPLES: int = Field(default=10)
+    VEO_HEDGE_HISTORY_SIZE: int = Field(default=200)
+    # Budget: hedges may not exceed this share of primary renders in the last
+    # hour, nor this many submissions per minute (keeps us under the quota).
+    VEO_HEDGE_MAX_RATIO: float = Field(default=0.1)
+    VEO_HEDGE_MAX_PER_MINUTE: int = Field(default=2)
+    # On the data volume, so the baseline survives recreating the container.
+    VEO_STATS_PATH: str = Field(default="/app/data/veo_render_stats.json")
+
+    # --- Clip library ---
+    CLIP_LIBRARY_PATH: str = Field(default="/app/data/clip_library.db")
+    # Minimum TF-IDF cosine similarity for a library clip to replace a Veo call.
+    # Every content word of the scene must also appear in the clip's description.
+    # Kept high: a lower score reuses more clips but swaps subjects and products.
+    CLIP_LIBRARY_MIN_SCORE: float = Field(default=0.85)
+    # Clips whose poster frames differ by at most this many hash bits are duplicates.
+    CLIP_LIBRARY_DUPLICATE_DISTANCE: int = Field(default=6)
+    # Entries neither added nor reused for this long are deleted by the artifact GC.
+    CLIP_LIBRARY_RETENTION_SECONDS: int = Field(default=30 * 86400)
+
+    # --- Artifact garbage collection ---
+    GC_INTERVAL_SECONDS: int = Field(default=3600)
+    # Intermediates of a job become collectable this long after the job started.
+    GC_INTERMEDIATE_TTL_SECONDS: int = Field(default=86400)
+    GC_DELETE_BATCH_SIZE: int = Field(default=100)
+    GC_BATCH_PAUSE_SECONDS: float = Field(default=1.0)
+
     # This tells Pydantic to look for a .env file.
     # Docker Compose's `env_file` makes this redundant but it's good practice.
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
@@ -0,0 +1,231 @@
+# services/asset-generator-agent/src/services/artifact_gc.py
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+
+from ..core.config import settings
+from .artifacts import JOBS_PREFIX, MANIFEST_PREFIX, job_finals_prefix, put_json
+from .clip_library import LIBRARY_PREFIX, clip_library
+
+GC_STAGE = "gc"
+FOLDED_MANIFEST = "manifest.json"
+
+
+def _read_json(minio_client, object_name: str) -> dict:
+    response = minio_client.get_object(settings.S3_BUCKET_NAME, object_name)
+    try:
+        return json.loads(response.read())
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def _merge_fragments(fragments: List[dict]) -> dict:
+    """
+    Folds a job's stage fragments into one record. Moves made by earlier GC
+    passes are applied to the job's finals.
+    """
+    job = {
+        "created_at": min(f["created_at"] for f in fragments),
+        "produced": set(), "finals": set(), "referenced": set(), "moved": {},
+    }
+    for fragment in fragments:
+        job["produced"].update(fragment.get("produced", []))
+        job["finals"].update(fragment.get("finals", []))
+        job["referenced"].update(fragment.get("referenced", []))
+        job["moved"].update(fragment.get("moved", {}))
+    job["finals"] = {job["moved"].get(name, name) for name in job["finals"]}
+    return job
+
+
+def load_manifests(minio_client) -> Dict[str, dict]:
+    """
+    Loads every job that still has fragments under manifests/.
+
+    Fully collected jobs have been folded into finals/ and their fragments
+    deleted, so the listing only grows with jobs from the last TTL window
+    (plus any whose intermediates are still referenced).
+    """
+    fragment_names = defaultdict(list)
+    for obj in minio_client.list_objects(settings.S3_BUCKET_NAME, prefix=f"{MANIFEST_PREFIX}/", recursive=True):
+        job_id = obj.object_name.split("/")[1]
+        fragment_names[job_id].append(obj.object_name)
+
+    jobs: Dict[str, dict] = {}
+    for job_id, names in fragment_names.items():
+        job = _merge_fragments([_read_json(minio_client, name) for name in names])
+        job["fragments"] = names
+        jobs[job_id] = job
+    return jobs
+
+
+def reference_counts(jobs: Dict[str, dict], now: float) -> Counter:
+    """
+    Counts live references to every object: each job still inside the TTL
+    holds its own outputs and whatever it references, and the clip library
+    holds the entries added or reused within its retention.
+    """
+    counts = Counter()
+    for job in jobs.values():
+        if now - job["created_at"] < settings.GC_INTERMEDIATE_TTL_SECONDS:
+            counts.update(job["produced"] | job["referenced"])
+    counts.update(clip_library.pinned_objects(since=now - settings.CLIP_LIBRARY_RETENTION_SECONDS))
+    return counts
+
+
+def compacted_name(job_id: str, object_name: str, created_at: float) -> str:
+    """finals/<yyyy>/<mm>/<job_id>/<file>"""
+    return f"{job_finals_prefix(job_id, created_at)}{os.path.basename(object_name)}"
+
+
+def _delete_in_batches(minio_client, object_names: List[str]) -> int:
+    """
+    Deletes objects a batch at a time, pausing in between so that the GC never
+    hogs storage I/O that live jobs need. Returns the number of batches.
+    """
+    batches = 0
+    for i in range(0, len(object_names), settings.GC_DELETE_BATCH_SIZE):
+        if batches:
+            time.sleep(settings.GC_BATCH_PAUSE_SECONDS)
+        batch = [DeleteObject(name) for name in object_names[i:i + settings.GC_DELETE_BATCH_SIZE]]
+        # remove_objects is lazy; the request is only sent while iterating.
+        for error in minio_client.remove_objects(settings.S3_BUCKET_NAME, batch):
+            print(f"⚠️ GC could not delete {error.name}: {error.message}")
+        batches += 1
+    return batches
+
+
+def collect_garbage(minio_client, dry_run: bool = False) -> dict:
+    """
+    One GC pass over the bucket.
+
+    - Intermediates of jobs older than the TTL are deleted once nothing else
+      references them.
+    - Finals of those jobs are moved to the compacted finals/ layout.
+    - Once nothing of a job is left to collect, its fragments are folded into
+      finals/<yyyy>/<mm>/<job_id>/manifest.json and removed from manifests/.
+    - Clip library entries past CLIP_LIBRARY_RETENTION_SECONDS that no live
+      job references are dropped from the index and their objects deleted.
+    Only objects listed in a manifest or the clip library are ever touched.
+    """
+    now = time.time()
+    jobs = load_manifests(minio_client)
+    counts = reference_counts(jobs, now)
+
+    sizes = {
+        obj.object_name: obj.size
+        for prefix in (JOBS_PREFIX, LIBRARY_PREFIX)
+        for obj in minio_client.list_objects(settings.S3_BUCKET_NAME, prefix=f"{prefix}/", recursive=True)
+    }
+
+    library_cutoff = now - settings.CLIP_LIBRARY_RETENTION_SECONDS
+    expired_clips = [
+        entry for entry in clip_library.expired_entries(library_cutoff)
+        if counts[entry.object_name] == 0 and counts[entry.poster_object_name] == 0
+    ]
+
+    to_delete: List[str] = []
+    moves: Dict[str, Dict[str, str]] = {}
+    fully_collected: Dict[str, bool] = {}
+    for job_id, job in jobs.items():
+        if now - job["created_at"] < settings.GC_INTERMEDIATE_TTL_SECONDS:
+            continue
+        expired = [name for name in job["produced"] if name in sizes]
+        to_delete.extend(name for name in expired if counts[name] == 0)
+        # Objects still referenced by a live job are retried on a later pass.
+        fully_collected[job_id] = all(counts[name] == 0 for name in expired)
+        moves[job_id] = {
+            name: compacted_name(job_id, name, job["created_at"])
+            for name in job["finals"] if name.startswith(f"{JOBS_PREFIX}/") and name in sizes
+        }
+
+    library_objects = [name for entry in expired_clips for name in (entry.object_name, entry.poster_object_name)]
+    report = {
+        "jobs_scanned": len(jobs),
+        "objects_deleted": len(to_delete) + len(library_objects),
+        "reclaimed_bytes": sum(sizes[name] for name in to_delete) + sum(sizes.get(name, 0) for name in library_objects),
+        "finals_moved": sum(len(job_moves) for job_moves in moves.values()),
+        "jobs_folded": sum(1 for done in fully_collected.values() if done),
+        "library_entries_expired": len(expired_clips),
+        "batches": 0,
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return report
+
+    # Out of the index first, so no scene picks a clip up while it is deleted.
+    # An entry reused since the listing above stays.
+    removed = set(clip_library.remove_expired([entry.entry_id for entry in expired_clips], library_cutoff))
+    if len(removed) < len(expired_clips):
+        expired_clips = [entry for entry in expired_clips if entry.entry_id in removed]
+        library_objects = [name for entry in expired_clips for name in (entry.object_name, entry.poster_object_name)]
+        report["library_entries_expired"] = len(expired_clips)
+        report["objects_deleted"] = len(to_delete) + len(library_objects)
+        report["reclaimed_bytes"] = sum(sizes[name] for name in to_delete) + sum(sizes.get(name, 0) for name in library_objects)
+
+    moved_sources: List[str] = []
+    stage_fragments: List[str] = []
+    gc_fragments: List[str] = []
+    for job_id, job_moves in moves.items():
+        job = jobs[job_id]
+        for source, target in job_moves.items():
+            minio_client.copy_object(settings.S3_BUCKET_NAME, target, CopySource(settings.S3_BUCKET_NAME, source))
+            moved_sources.append(source)
+
+        all_moves = {**job["moved"], **job_moves}
+        finals = sorted({all_moves.get(name, name) for name in job["finals"]})
+        # Written before any source is deleted, so a crash never loses track of a final.
+        if fully_collected[job_id]:
+            put_json(minio_client, f"{job_finals_prefix(job_id, job['created_at'])}{FOLDED_MANIFEST}", {
+                "job_id": job_id,
+                "created_at": job["created_at"],
+                "collected_at": now,
+                "finals": finals,
+                "moved": all_moves,
+            })
+            gc_name = f"{MANIFEST_PREFIX}/{job_id}/{GC_STAGE}.json"
+            stage_fragments.extend(name for name in job["fragments"] if name != gc_name)
+            if gc_name in job["fragments"]:
+                gc_fragments.append(gc_name)
+        elif job_moves:
+            put_json(minio_client, f"{MANIFEST_PREFIX}/{job_id}/{GC_STAGE}.json", {
+                "job_id": job_id,
+                "stage": GC_STAGE,
+                # The job's own timestamp, so a leftover gc fragment never restarts the TTL.
+                "created_at": job["created_at"],
+                "collected_at": now,
+                "finals": finals,
+                "moved": all_moves,
+            })
+
+    report["batches"] = _delete_in_batches(minio_client, to_delete + library_objects + moved_sources + stage_fragments)
+    # The gc fragment holds the move map; it goes last so that a partial
+    # failure above still leaves a job's finals resolvable on the next pass.
+    report["batches"] += _delete_in_batches(minio_client, gc_fragments)
+    return report
+
+
+def resolve_job_artifacts(minio_client, job_id: str) -> Optional[dict]:
+    """
+    Where a job's finals live right now: under jobs/<job_id>/ while the job is
+    recent, under finals/ once the GC has compacted it. None if unknown.
+    """
+    names = [
+        obj.object_name
+        for obj in minio_client.list_objects(settings.S3_BUCKET_NAME, prefix=f"{MANIFEST_PREFIX}/{job_id}/", recursive=True)
+    ]
+    if names:
+        job = _merge_fragments([_read_json(minio_client, name) for name in names])
+        return {"job_id": job_id, "status": "live", "finals": sorted(job["finals"])}
+
+    try:
+        folded = _read_json(minio_client, f"{job_finals_prefix(job_id)}{FOLDED_MANIFEST}")
+    except S3Error:
+        return None
+    return {"job_id": job_id, "status": "compacted", "finals": folded["finals"]}
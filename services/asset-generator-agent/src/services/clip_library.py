@@ -0,0 +1,330 @@
+# services/asset-generator-agent/src/services/clip_library.py
+import math
+import os
+import re
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from ..core.config import settings
+
+LIBRARY_PREFIX = "library"
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "in", "on", "at", "to", "with", "for", "by",
+    "from", "into", "as", "is", "are", "its", "it", "this", "that", "shot",
+}
+
+
+@dataclass
+class ClipEntry:
+    entry_id: str
+    visual_description: str
+    duration_seconds: float
+    aspect_ratio: str
+    object_name: str
+    poster_object_name: str
+    phash: str
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def extract_poster_frame(video_bytes: bytes) -> bytes:
+    """
+    Returns a JPEG poster frame taken one second into the clip.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "clip.mp4")
+        poster_path = os.path.join(temp_dir, "poster.jpg")
+        with open(video_path, "wb") as f:
+            f.write(video_bytes)
+        subprocess.run([
+            "ffmpeg", "-y", "-ss", "1", "-i", video_path,
+            "-frames:v", "1", "-vf", "scale=640:-2", poster_path
+        ], check=True, capture_output=True)
+        with open(poster_path, "rb") as f:
+            return f.read()
+
+
+def perceptual_hash(image_bytes: bytes) -> str:
+    """
+    64-bit difference hash (dHash) of an image, as 16 hex characters.
+    """
+    image = Image.open(BytesIO(image_bytes)).convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def _cosine(query: Dict[str, float], document: Dict[str, float]) -> float:
+    """Cosine similarity of two unit-length TF-IDF vectors."""
+    return sum(weight * document.get(term, 0.0) for term, weight in query.items())
+
+
+def _covers(query_terms: set, document_counts: Counter) -> bool:
+    """True if every content term of the query appears in the document."""
+    return all(term in document_counts for term in query_terms)
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+class ClipLibrary:
+    """
+    Local index of previously generated scene clips.
+
+    Entries live in a SQLite file on the worker's volume. Retrieval is TF-IDF
+    cosine similarity over the scene's visual description, computed in process
+    and refreshed incrementally as other worker processes add clips.
+
+    Entries not reused within CLIP_LIBRARY_RETENTION_SECONDS of being added
+    (or last reused) are expired by the artifact GC, together with their objects.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.CLIP_LIBRARY_PATH
+        self._lock = threading.Lock()
+        self._last_rowid = 0
+        self._entries: List[ClipEntry] = []
+        self._term_counts: List[Counter] = []
+        self._document_frequency: Counter = Counter()
+        self._vectors: Optional[List[Dict[str, float]]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS clips (
+                entry_id TEXT PRIMARY KEY,
+                visual_description TEXT NOT NULL,
+                duration_seconds REAL NOT NULL,
+                aspect_ratio TEXT NOT NULL,
+                object_name TEXT NOT NULL,
+                poster_object_name TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(clips)")}
+        if "last_used_at" not in columns:
+            conn.execute("ALTER TABLE clips ADD COLUMN last_used_at REAL")
+        return conn
+
+    def _refresh(self):
+        """
+        Loads entries added since the last refresh (by any worker process).
+        Starts over when the GC has expired entries in the meantime.
+        """
+        conn = self._connect()
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM clips WHERE rowid <= ?", (self._last_rowid,)).fetchone()
+            if count < len(self._entries):
+                self._last_rowid = 0
+                self._entries, self._term_counts = [], []
+                self._document_frequency = Counter()
+                self._vectors = None
+            rows = conn.execute(
+                "SELECT rowid, entry_id, visual_description, duration_seconds, aspect_ratio, "
+                "object_name, poster_object_name, phash FROM clips WHERE rowid > ? ORDER BY rowid",
+                (self._last_rowid,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for rowid, *fields in rows:
+            entry = ClipEntry(*fields)
+            counts = Counter(tokenize(entry.visual_description))
+            self._entries.append(entry)
+            self._term_counts.append(counts)
+            self._document_frequency.update(counts.keys())
+            self._last_rowid = rowid
+
+        if rows:
+            # IDF weights shift with every new document.
+            self._vectors = None
+        if self._vectors is None:
+            self._vectors = [self._vector(counts) for counts in self._term_counts]
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        total = len(self._entries)
+        vector = {
+            term: (1 + math.log(count)) * (math.log((total + 1) / (self._document_frequency[term] + 1)) + 1)
+            for term, count in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term: w / norm for term, w in vector.items()}
+
+    def search(self, visual_description: str, aspect_ratio: str, duration_seconds: float,
+               min_score: Optional[float] = None) -> Optional[tuple]:
+        """
+        Returns (entry, score) for the most similar clip with the same aspect
+        ratio and duration, or None if nothing scores at least `min_score`.
+
+        Bag-of-words similarity cannot tell "a man drinking coffee" from "a
+        woman drinking coffee", so a candidate must also contain every content
+        term of the query. This misses rephrasings ("cup of coffee" vs "coffee
+        cup" still match, "mug" vs "cup" does not); a missed reuse only costs
+        a Veo call, while a wrong one puts the wrong subject into an ad.
+        """
+        min_score = settings.CLIP_LIBRARY_MIN_SCORE if min_score is None else min_score
+        with self._lock:
+            self._refresh()
+            query_counts = Counter(tokenize(visual_description))
+            query = self._vector(query_counts)
+            best, best_score = None, 0.0
+            for entry, counts, document in zip(self._entries, self._term_counts, self._vectors):
+                if entry.aspect_ratio != aspect_ratio or entry.duration_seconds != duration_seconds:
+                    continue
+                if not _covers(set(query_counts), counts):
+                    continue
+                score = _cosine(query, document)
+                if score > best_score:
+                    best, best_score = entry, score
+
+        if best is None or best_score < min_score:
+            return None
+        return best, round(best_score, 3)
+
+    def find_duplicate(self, phash: str, visual_description: str, aspect_ratio: str,
+                       duration_seconds: float) -> Optional[ClipEntry]:
+        """
+        Returns an existing entry that looks the same as a clip with this hash
+        and was generated for a similar description.
+
+        A single poster frame is weak evidence on its own: dark or near-uniform
+        frames all hash to roughly zero. Requiring the description to match as
+        well keeps unrelated clips (and their descriptions) out of each other's way.
+        """
+        with self._lock:
+            self._refresh()
+            query_counts = Counter(tokenize(visual_description))
+            query = self._vector(query_counts)
+            for entry, counts, document in zip(self._entries, self._term_counts, self._vectors):
+                if (entry.aspect_ratio == aspect_ratio and entry.duration_seconds == duration_seconds
+                        and hamming_distance(entry.phash, phash) <= settings.CLIP_LIBRARY_DUPLICATE_DISTANCE
+                        and _covers(set(query_counts), counts)
+                        and _cosine(query, document) >= settings.CLIP_LIBRARY_MIN_SCORE):
+                    return entry
+        return None
+
+    def new_entry(self, visual_description: str, duration_seconds: float, aspect_ratio: str, phash: str) -> ClipEntry:
+        """
+        Builds an entry and the object names its clip and poster should be
+        uploaded to. Nothing is indexed until `add` is called.
+        """
+        entry_id = uuid.uuid4().hex
+        return ClipEntry(
+            entry_id=entry_id,
+            visual_description=visual_description,
+            duration_seconds=duration_seconds,
+            aspect_ratio=aspect_ratio,
+            object_name=f"{LIBRARY_PREFIX}/{entry_id}.mp4",
+            poster_object_name=f"{LIBRARY_PREFIX}/{entry_id}.jpg",
+            phash=phash,
+        )
+
+    def add(self, entry: ClipEntry):
+        """
+        Indexes an entry whose objects have already been uploaded.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO clips (entry_id, visual_description, duration_seconds, aspect_ratio, "
+                    "object_name, poster_object_name, phash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry.entry_id, entry.visual_description, entry.duration_seconds, entry.aspect_ratio,
+                     entry.object_name, entry.poster_object_name, entry.phash, time.time()),
+                )
+        finally:
+            conn.close()
+
+    def pinned_objects(self, since: float) -> List[str]:
+        """
+        Objects of every entry added or reused since `since`; the garbage
+        collector keeps these.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT object_name, poster_object_name FROM clips WHERE COALESCE(last_used_at, created_at) >= ?",
+                (since,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [name for row in rows for name in row]
+
+    def expired_entries(self, before: float) -> List[ClipEntry]:
+        """
+        Entries neither added nor reused since `before`.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT entry_id, visual_description, duration_seconds, aspect_ratio, object_name, "
+                "poster_object_name, phash FROM clips WHERE COALESCE(last_used_at, created_at) < ?",
+                (before,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [ClipEntry(*row) for row in rows]
+
+    def remove_expired(self, entry_ids: List[str], before: float) -> List[str]:
+        """
+        Drops these entries from the index unless one was reused in the
+        meantime. Returns the ids actually removed; only their objects may
+        be deleted.
+        """
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = []
+            for entry_id in entry_ids:
+                cursor = conn.execute(
+                    "DELETE FROM clips WHERE entry_id = ? AND COALESCE(last_used_at, created_at) < ?",
+                    (entry_id, before),
+                )
+                if cursor.rowcount:
+                    removed.append(entry_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return removed
+
+    def record_use(self, entry_id: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE clips SET uses = uses + 1, last_used_at = ? WHERE entry_id = ?",
+                    (time.time(), entry_id),
+                )
+        finally:
+            conn.close()
+
+
+clip_library = ClipLibrary()
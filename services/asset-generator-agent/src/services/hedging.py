@@ -0,0 +1,239 @@
+# services/asset-generator-agent/src/services/hedging.py
+import fcntl
+import functools
+import json
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from ..core.config import settings
+
+HOUR = 3600
+MINUTE = 60
+
+
+def best_effort(default=None):
+    """
+    Stats are bookkeeping: a failure is logged and `default` returned, so that
+    it can never fail the render being measured.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                print(f"⚠️ Render stats unavailable ({method.__name__}): {e}")
+                return default
+        return wrapper
+    return decorator
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Nearest-rank percentile. Returns None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RenderStatsStore:
+    """
+    Recent Veo render times, hedge budget and outcomes for this node.
+
+    Every Celery worker process on the node shares one JSON file guarded by
+    an flock, so the percentile threshold and the budget are node-wide. The
+    file lives on the worker's data volume so the baseline survives the
+    container being recreated when VEO_HEDGING_ENABLED is flipped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.VEO_STATS_PATH
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"⚠️ Render stats file is corrupt, starting over: {e}")
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # The data file is swapped out on every write, so the lock lives in its own file.
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                data = self._read()
+                data.setdefault("durations", {})
+                data.setdefault("primaries", [])
+                data.setdefault("hedges", [])
+                data.setdefault("renders", [])
+                yield data
+                # Write to a temp file and rename it over the old one, so a crash
+                # mid-write never leaves half a JSON document behind.
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".veo_stats_")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(data, f)
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # --- THRESHOLD ---
+    @best_effort()
+    def hedge_threshold(self, model: str) -> Optional[float]:
+        """
+        Seconds after which a render of `model` counts as slow, or None while
+        there is not enough history to tell.
+        """
+        with self._locked() as data:
+            durations = data["durations"].get(model, [])
+        if len(durations) < settings.VEO_HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(durations, settings.VEO_HEDGE_PERCENTILE)
+
+    @best_effort()
+    def record_operation_duration(self, model: str, seconds: float):
+        """
+        Adds the duration of one completed Veo operation, measured from its own
+        submission. For a primary that lost to a hedge, the caller records the
+        time it had run so far as a lower bound.
+        """
+        with self._locked() as data:
+            durations = data["durations"].setdefault(model, [])
+            durations.append(round(seconds, 2))
+            del durations[:-settings.VEO_HEDGE_HISTORY_SIZE]
+
+    # --- BUDGET ---
+    @best_effort()
+    def record_primary(self):
+        with self._locked() as data:
+            now = time.time()
+            data["primaries"] = [t for t in data["primaries"] if now - t < HOUR] + [now]
+
+    @best_effort(default=False)
+    def try_acquire_hedge(self) -> bool:
+        """
+        Reserves one hedge submission if the budget allows it.
+        """
+        with self._locked() as data:
+            now = time.time()
+            primaries = [t for t in data["primaries"] if now - t < HOUR]
+            hedges = [t for t in data["hedges"] if now - t < HOUR]
+            data["primaries"], data["hedges"] = primaries, hedges
+
+            last_minute = sum(1 for t in hedges if now - t < MINUTE)
+            if last_minute >= settings.VEO_HEDGE_MAX_PER_MINUTE:
+                return False
+            # Floor, not ceil: one render an hour at a 0.1 ratio earns no hedge.
+            if len(hedges) + 1 > settings.VEO_HEDGE_MAX_RATIO * len(primaries):
+                return False
+
+            hedges.append(now)
+            return True
+
+    @best_effort()
+    def release_hedge(self):
+        """
+        Gives back a reservation whose submission was rejected by the provider.
+        """
+        with self._locked() as data:
+            if data["hedges"]:
+                data["hedges"].pop()
+
+    # --- OUTCOMES ---
+    @best_effort()
+    def record_render(self, model: str, latency: float, hedged: bool, hedge_won: bool, extra_operations: int,
+                      job_id: Optional[str] = None):
+        with self._locked() as data:
+            data["renders"].append({
+                "model": model,
+                "job_id": job_id,
+                "latency": round(latency, 2),
+                "hedging_enabled": settings.VEO_HEDGING_ENABLED,
+                "hedged": hedged,
+                "hedge_won": hedge_won,
+                "extra_operations": extra_operations,
+                "finished_at": time.time(),
+            })
+            # Trim baseline and hedged renders separately so that a long hedged
+            # run never pushes the baseline out of the history.
+            enabled = settings.VEO_HEDGING_ENABLED
+            same_mode = [r for r in data["renders"] if r["hedging_enabled"] == enabled]
+            if len(same_mode) > settings.VEO_HEDGE_HISTORY_SIZE:
+                data["renders"].remove(same_mode[0])
+
+    def summary(self) -> dict:
+        """
+        Tail latency with hedging against the unhedged baseline, and what it
+        cost, both per scene render and per job.
+
+        A primary that loses a race is discarded, so its true duration is never
+        known. The baseline is therefore taken from renders recorded while
+        hedging was disabled rather than reconstructed from hedged ones.
+        Job latency is the total Veo render time of a job's scenes (they are
+        rendered one after another); scenes reused from the clip library are
+        not renders and do not count.
+        """
+        with self._locked() as data:
+            renders = list(data["renders"])
+
+        hedged_renders = [r for r in renders if r["hedging_enabled"]]
+        baseline_latencies = [r["latency"] for r in renders if not r["hedging_enabled"]]
+        latencies = [r["latency"] for r in hedged_renders]
+        extra_operations = sum(r["extra_operations"] for r in hedged_renders)
+
+        report = {
+            "renders": len(hedged_renders),
+            "baseline_renders": len(baseline_latencies),
+            "hedged": sum(1 for r in hedged_renders if r["hedged"]),
+            "hedge_wins": sum(1 for r in hedged_renders if r["hedge_won"]),
+            "extra_operations": extra_operations,
+            "extra_cost_ratio": round(extra_operations / len(hedged_renders), 3) if hedged_renders else 0.0,
+        }
+        job_latencies = _job_latencies(hedged_renders)
+        baseline_job_latencies = _job_latencies([r for r in renders if not r["hedging_enabled"]])
+        report["jobs"] = len(job_latencies)
+        report["baseline_jobs"] = len(baseline_job_latencies)
+
+        for prefix, observed_values, baseline_values in (
+            ("", latencies, baseline_latencies),
+            ("job_", job_latencies, baseline_job_latencies),
+        ):
+            for pct in (50, 95, 99):
+                observed = percentile(observed_values, pct)
+                baseline = percentile(baseline_values, pct)
+                report[f"{prefix}p{pct}_latency"] = observed
+                report[f"{prefix}p{pct}_baseline"] = baseline
+                if pct != 50:
+                    report[f"{prefix}p{pct}_improvement"] = (
+                        round(baseline - observed, 2) if observed is not None and baseline is not None else None
+                    )
+        return report
+
+
+def _job_latencies(renders: List[dict]) -> List[float]:
+    """Sums scene render latencies per job; renders without a job id are skipped."""
+    totals = defaultdict(float)
+    for r in renders:
+        if r.get("job_id"):
+            totals[r["job_id"]] += r["latency"]
+    return [round(total, 2) for total in totals.values()]
+
+
+render_stats = RenderStatsStore()
@@ -0,0 +1,204 @@
+# services/asset-generator-agent/src/services/voiceover.py
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+from ..core.config import settings
+
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
+
+# A period after one of these does not end the sentence.
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "st", "jr", "sr", "prof", "mt", "vs", "etc",
+    "inc", "ltd", "co", "e.g", "i.e",
+}
+# Dotted initialisms ("U.S.", "A.M.") do not end the sentence either.
+INITIALISM = re.compile(r"(?:[A-Za-z]\.){2,}")
+
+
+def _ends_mid_sentence(text: str) -> bool:
+    last_token = text.split()[-1]
+    return (last_token.rstrip(".").lower() in ABBREVIATIONS and last_token.endswith(".")) \
+        or bool(INITIALISM.fullmatch(last_token))
+
+
+def split_sentences(script_text: str) -> List[str]:
+    """
+    Splits a script at sentence boundaries, but not after common abbreviations
+    ("Dr. Smith") or initialisms ("the U.S. market"). A sentence that really
+    ends in one is joined to the next, which only makes that chunk longer.
+    Fragments of one or two words (e.g. "Yes.") are joined to a
+    neighbouring sentence, since a separate request for them would sound
+    clipped: the next one if the fragment opens the script, else the one before.
+    """
+    parts = [p.strip() for p in re.split(r"(?<=[.!?…])\s+", script_text.strip()) if p.strip()]
+
+    joined: List[str] = []
+    for part in parts:
+        if joined and _ends_mid_sentence(joined[-1]):
+            joined[-1] = f"{joined[-1]} {part}"
+        else:
+            joined.append(part)
+
+    sentences: List[str] = []
+    pending = ""
+    for part in joined:
+        if pending:
+            part, pending = f"{pending} {part}", ""
+        if len(part.split()) > 2:
+            sentences.append(part)
+        elif sentences:
+            sentences[-1] = f"{sentences[-1]} {part}"
+        else:
+            pending = part
+    if pending:
+        sentences.append(pending)
+    return sentences
+
+
+def probe_duration(path: str) -> float:
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", path
+    ], check=True, capture_output=True, text=True)
+    return float(result.stdout.strip())
+
+
+@contextmanager
+def tts_slot():
+    """
+    Blocks until one of the node's TTS_MAX_CONCURRENCY request slots is free,
+    then holds it. The slots are flock'd files shared by every worker process,
+    so the limit holds for the node rather than per voiceover.
+    """
+    os.makedirs(settings.TTS_SLOT_DIR, exist_ok=True)
+    while True:
+        for slot in range(settings.TTS_MAX_CONCURRENCY):
+            fd = os.open(os.path.join(settings.TTS_SLOT_DIR, f"slot_{slot}.lock"), os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+
+            try:
+                yield slot
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            return
+        time.sleep(settings.TTS_SLOT_POLL_SECONDS)
+
+
+def _request_with_retries(label: str, request: Callable):
+    """
+    Runs one TTS request in a node slot, retrying with exponential backoff.
+    The slot is released while backing off.
+    """
+    for attempt in range(settings.TTS_MAX_RETRIES + 1):
+        try:
+            with tts_slot():
+                return request()
+        except Exception as e:
+            if attempt == settings.TTS_MAX_RETRIES:
+                raise
+            delay = settings.TTS_RETRY_BACKOFF_SECONDS * 2 ** attempt
+            print(f"⚠️ TTS request for {label} failed ({e}). Retrying in {delay:g}s...")
+            time.sleep(delay)
+
+
+def synthesize_script(client, script_text: str, voice_id: str) -> bytes:
+    """
+    The whole script in a single request.
+    """
+    def request() -> bytes:
+        audio = client.text_to_speech.convert(
+            text=script_text,
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT
+        )
+        # convert() streams; the request only finishes once the generator is consumed.
+        return b"".join(audio)
+
+    return _request_with_retries("the full script", request)
+
+
+def synthesize_chunks(client, sentences: List[str], voice_id: str, temp_dir: str) -> List[str]:
+    """
+    Synthesizes every sentence concurrently, within the node's
+    TTS_MAX_CONCURRENCY request slots, and returns the chunk files in script
+    order. A chunk that still fails after its retries fails the whole call.
+
+    Each request gets its neighbours as previous_text/next_text so the voice
+    keeps the intonation of the full script across chunk boundaries.
+    """
+    def synthesize(index: int) -> str:
+        chunk_path = os.path.join(temp_dir, f"chunk_{index:03d}.mp3")
+
+        def request() -> str:
+            audio = client.text_to_speech.convert(
+                text=sentences[index],
+                voice_id=voice_id,
+                model_id=TTS_MODEL_ID,
+                output_format=TTS_OUTPUT_FORMAT,
+                previous_text=" ".join(sentences[:index]) or None,
+                next_text=" ".join(sentences[index + 1:]) or None,
+            )
+            with open(chunk_path, "wb") as f:
+                for part in audio:
+                    f.write(part)
+            return chunk_path
+
+        return _request_with_retries(f"sentence {index + 1}", request)
+
+    with ThreadPoolExecutor(max_workers=min(settings.TTS_MAX_CONCURRENCY, len(sentences))) as pool:
+        return list(pool.map(synthesize, range(len(sentences))))
+
+
+def stitch_chunks(chunk_paths: List[str], output_path: str) -> List[Tuple[float, float]]:
+    """
+    Joins chunks into one MP3 with short crossfades, so encoder padding at
+    chunk edges never turns into audible gaps. Returns the (start, end)
+    of every chunk in the stitched file.
+    """
+    durations = [probe_duration(path) for path in chunk_paths]
+    # A crossfade can never be longer than the shortest chunk.
+    crossfade = min([settings.TTS_CROSSFADE_SECONDS] + [d / 2 for d in durations])
+
+    spans = []
+    start = 0.0
+    for duration in durations:
+        spans.append((round(start, 3), round(start + duration, 3)))
+        start += duration - crossfade
+
+    if len(chunk_paths) == 1:
+        shutil.copyfile(chunk_paths[0], output_path)
+        return spans
+
+    inputs = []
+    for path in chunk_paths:
+        inputs.extend(["-i", path])
+
+    # [0][1]acrossfade[a1];[a1][2]acrossfade[a2];...
+    filters = []
+    previous = "[0:a]"
+    for i in range(1, len(chunk_paths)):
+        label = f"[a{i}]"
+        filters.append(f"{previous}[{i}:a]acrossfade=d={crossfade:.3f}:c1=tri:c2=tri{label}")
+        previous = label
+
+    subprocess.run([
+        "ffmpeg", "-y", *inputs,
+        "-filter_complex", ";".join(filters), "-map", previous,
+        "-c:a", "libmp3lame", "-b:a", "128k", "-ar", "44100", output_path
+    ], check=True, capture_output=True)
+    return spans
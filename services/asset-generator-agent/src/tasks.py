@@ -1,3 +1,5 @@
+import os
+import tempfile
 import time
 from io import BytesIO
 from urllib.parse import urlparse
@@ -9,6 +11,14 @@ from google.api_core import exceptions as google_exceptions
 
 from .celery_app import celery
 from .core.config import settings
+from .services.hedging import render_stats
+from .services.clip_library import clip_library, extract_poster_frame, perceptual_hash
+from .services.artifacts import job_object_name, record_artifacts
+from .services.artifact_gc import collect_garbage, resolve_job_artifacts
+from .services.voiceover import (
+    split_sentences, synthesize_chunks, synthesize_script, stitch_chunks
+)
+from minio.commonconfig import CopySource
 from elevenlabs.client import ElevenLabs 
 
 
@@ -36,27 +46,171 @@ except Exception as e:
 video_config = types.GenerateVideosConfig(
     aspect_ratio="16:9", number_of_videos=1, duration_seconds=6, person_generation="ALLOW_ALL")
 
+def _succeeded(operation) -> bool:
+    return bool(operation.done and operation.result and operation.result.generated_videos)
+
+def render_video(visual_description: str, job_id: str = None):
+    """
+    Runs one Veo operation to completion and returns the generated video.
+
+    With hedging enabled, a render that outlives the slow-render threshold for
+    the model gets a duplicate operation; whichever succeeds first is kept and
+    the other is discarded (Veo operations cannot be cancelled).
+    """
+    model = settings.VEO_MODEL
+    started_at = time.monotonic()
+    operation = veo_client.models.generate_videos(model=model, prompt=visual_description, config=video_config)
+    render_stats.record_primary()
+
+    threshold = render_stats.hedge_threshold(model) if settings.VEO_HEDGING_ENABLED else None
+    hedge, hedge_started_at, hedge_considered = None, None, threshold is None
+    # Stays set even if the hedge is dropped later; it was still paid for.
+    hedge_submitted = False
+
+    while True:
+        if _succeeded(operation):
+            winner, winner_started_at, hedge_won = operation, started_at, False
+            break
+        if hedge is not None and _succeeded(hedge):
+            winner, winner_started_at, hedge_won = hedge, hedge_started_at, True
+            break
+        # A failed operation only ends the render if there is nothing left to wait for.
+        if operation.done and (hedge is None or hedge.done):
+            raise ValueError("No videos generated")
+
+        if not hedge_considered and time.monotonic() - started_at >= threshold:
+            hedge_considered = True
+            if render_stats.try_acquire_hedge():
+                print(f"🐢 Render slower than p{settings.VEO_HEDGE_PERCENTILE:g} ({threshold:.0f}s). Submitting hedge...")
+                try:
+                    hedge = veo_client.models.generate_videos(model=model, prompt=visual_description, config=video_config)
+                    hedge_started_at, hedge_submitted = time.monotonic(), True
+                except Exception as e:
+                    # A rejected hedge must never fail the render it was meant to speed up.
+                    print(f"⚠️ Hedge submission failed: {e}")
+                    render_stats.release_hedge()
+
+        time.sleep(settings.VEO_POLL_SECONDS)
+        if not operation.done:
+            operation = veo_client.operations.get(operation)
+        if hedge is not None and not hedge.done:
+            try:
+                hedge = veo_client.operations.get(hedge)
+            except Exception as e:
+                # Same rule as for submission: keep waiting on the primary alone.
+                print(f"⚠️ Polling hedge failed, dropping it: {e}")
+                hedge = None
+
+    finished_at = time.monotonic()
+    render_stats.record_operation_duration(model, finished_at - winner_started_at)
+    if hedge_won:
+        # The primary that lost would have taken at least this long. Leaving it
+        # out would drop exactly the slow tail the threshold is computed from.
+        render_stats.record_operation_duration(model, finished_at - started_at)
+    render_stats.record_render(
+        model,
+        latency=finished_at - started_at,
+        hedged=hedge_submitted,
+        hedge_won=hedge_won,
+        extra_operations=1 if hedge_submitted else 0,
+        job_id=job_id,
+    )
+    if hedge_won:
+        print(f"🏁 Hedge finished first after {finished_at - started_at:.0f}s. Discarding primary operation.")
+
+    return winner.result.generated_videos[0].video
+
+def _asset_url(object_name: str) -> str:
+    return f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{object_name}"
+
+def _find_reusable_clip(visual_description: str):
+    match = clip_library.search(
+        visual_description,
+        aspect_ratio=video_config.aspect_ratio,
+        duration_seconds=video_config.duration_seconds,
+    )
+    if not match:
+        return None
+    entry, score = match
+    try:
+        # The index can outlive its objects; only reuse clips that still exist.
+        minio_client.stat_object(settings.S3_BUCKET_NAME, entry.object_name)
+    except Exception:
+        return None
+    return entry, score
+
+def _add_to_clip_library(file_name: str, visual_description: str, video_bytes: bytes):
+    """
+    Indexes a freshly generated clip. The library keeps its own copy because
+    per-scene object names are reused by later jobs.
+    """
+    poster_bytes = extract_poster_frame(video_bytes)
+    phash = perceptual_hash(poster_bytes)
+
+    duplicate = clip_library.find_duplicate(
+        phash, visual_description, video_config.aspect_ratio, video_config.duration_seconds
+    )
+    if duplicate:
+        print(f"📚 Clip and description match library entry {duplicate.entry_id}. Not indexing again.")
+        return
+
+    entry = clip_library.new_entry(
+        visual_description, video_config.duration_seconds, video_config.aspect_ratio, phash
+    )
+    minio_client.copy_object(
+        settings.S3_BUCKET_NAME, entry.object_name, CopySource(settings.S3_BUCKET_NAME, file_name)
+    )
+    minio_client.put_object(
+        bucket_name=settings.S3_BUCKET_NAME,
+        object_name=entry.poster_object_name,
+        data=BytesIO(poster_bytes),
+        length=len(poster_bytes),
+        content_type='image/jpeg'
+    )
+    clip_library.add(entry)
+    print(f"📚 Added clip to library as {entry.entry_id}.")
+
 # --- VIDEO TASK (Existing) ---
 @celery.task(name="generate_asset_task", bind=True, autoretry_for=(google_exceptions.ResourceExhausted,), retry_backoff=5, max_retries=5)
-def generate_asset_task(self, scene_number: int, visual_description: str) -> dict:
+def generate_asset_task(self, scene_number: int, visual_description: str, reuse_policy: str = "never", job_id: str = None) -> dict:
+    """
+    Generates the clip for one scene. With reuse_policy="similar", a close
+    enough clip from the library is returned instead of calling Veo.
+    """
     print(f"🎬 Starting VEO generation for scene {scene_number}")
     
     if not veo_client or not minio_client:
         return {"scene_number": scene_number, "error": "Clients not initialized"}
 
     try:
+        # 0. Look for a reusable clip
+        if reuse_policy == "similar":
+            try:
+                match = _find_reusable_clip(visual_description)
+            except Exception as e:
+                print(f"⚠️ Clip library search failed: {e}")
+                match = None
+            if match:
+                entry, score = match
+                try:
+                    clip_library.record_use(entry.entry_id)
+                except Exception as e:
+                    print(f"⚠️ Could not record clip library use: {e}")
+                record_artifacts(minio_client, job_id, f"scene_{scene_number}", referenced=[entry.object_name])
+                print(f"♻️ Reusing library clip {entry.entry_id} for scene {scene_number} (similarity {score}).")
+                return {
+                    "scene_number": scene_number,
+                    "asset_url": _asset_url(entry.object_name),
+                    "reused_from": entry.entry_id,
+                    "similarity": score,
+                }
+
         # 1. Generate Video
-        operation = veo_client.models.generate_videos(model="veo-2.0-generate-001", prompt=visual_description, config=video_config)
-        while not operation.done:
-            time.sleep(20)
-            operation = veo_client.operations.get(operation)
-        
-        if not operation.result or not operation.result.generated_videos:
-            raise ValueError("No videos generated")
+        video = render_video(visual_description, job_id=job_id)
             
         # 2. Download & Upload
-        video_bytes = veo_client.files.download(file=operation.result.generated_videos[0].video)
-        file_name = f"scene_{scene_number}.mp4"
+        video_bytes = veo_client.files.download(file=video)
+        file_name = job_object_name(job_id, f"scene_{scene_number}.mp4")
         
         if not minio_client.bucket_exists(settings.S3_BUCKET_NAME):
             minio_client.make_bucket(settings.S3_BUCKET_NAME)
@@ -68,8 +222,15 @@ def generate_asset_task(self, scene_number: int, visual_description: str) -> dic
             length=len(video_bytes),
             content_type='video/mp4'
         )
+        record_artifacts(minio_client, job_id, f"scene_{scene_number}", produced=[file_name])
+
+        # 3. Index for later reuse (never fails the scene)
+        try:
+            _add_to_clip_library(file_name, visual_description, video_bytes)
+        except Exception as e:
+            print(f"⚠️ Could not add clip to library: {e}")
         
-        asset_url = f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{file_name}"
+        asset_url = _asset_url(file_name)
         return {"scene_number": scene_number, "asset_url": asset_url}
 
     except google_exceptions.ResourceExhausted as e:
@@ -78,10 +239,48 @@ def generate_asset_task(self, scene_number: int, visual_description: str) -> dic
     except Exception as e:
         return {"scene_number": scene_number, "error": str(e)}
 
+@celery.task(name="hedge_stats_task")
+def hedge_stats_task() -> dict:
+    """
+    Reports how hedging changed tail render and job latency and what it cost,
+    as seen by this node.
+    """
+    return render_stats.summary()
+
+@celery.task(name="artifact_gc_task")
+def artifact_gc_task(dry_run: bool = False) -> dict:
+    """
+    Reference-counted cleanup of job artifacts (scheduled on 'gc_queue').
+    """
+    if not minio_client:
+        return {"error": "MinIO client not initialized"}
+    print("🧹 Starting artifact GC pass...")
+    report = collect_garbage(minio_client, dry_run=dry_run)
+    print(f"🧹 Artifact GC finished: {report}")
+    return report
+
+@celery.task(name="resolve_job_artifacts_task")
+def resolve_job_artifacts_task(job_id: str) -> dict:
+    """
+    Current URLs of a job's finals, which move to finals/ once the GC has
+    compacted the job.
+    """
+    if not minio_client:
+        return {"error": "MinIO client not initialized"}
+    artifacts = resolve_job_artifacts(minio_client, job_id)
+    if artifacts is None:
+        return {"job_id": job_id, "status": "unknown", "final_urls": []}
+    return {
+        "job_id": job_id,
+        "status": artifacts["status"],
+        "final_urls": [_asset_url(name) for name in artifacts["finals"]],
+    }
+
 @celery.task(name="generate_audio_task")
-def generate_audio_task(script_text: str) -> dict:
+def generate_audio_task(script_text: str, job_id: str = None) -> dict:
     """
     Generates AI Voiceover using the official ElevenLabs SDK and uploads to MinIO.
+    In chunked mode the result also carries per-sentence timestamps.
     """
     print(f"🎙️ Generating ElevenLabs Audio for: '{script_text[:30]}...'")
     
@@ -106,17 +305,34 @@ def generate_audio_task(script_text: str) -> dict:
         # We do NOT use 'play()'. We capture the data.
         voice_id = getattr(settings, "ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb") # Default to a known voice if missing
         
-        audio_generator = client.text_to_speech.convert(
-            text=script_text,
-            voice_id=voice_id,
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128"
-        )
+        sentences = split_sentences(script_text)
+        sentence_timestamps = None
+        audio_bytes = None
+
+        if settings.TTS_CHUNKED_ENABLED and len(sentences) > 1:
+            # Chunked mode: one request per sentence, run concurrently, so the
+            # wait is bounded by the longest sentence rather than the script.
+            print(f"🧩 Synthesizing {len(sentences)} sentences concurrently...")
+            try:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    chunk_paths = synthesize_chunks(client, sentences, voice_id, temp_dir)
+                    stitched_path = os.path.join(temp_dir, "voiceover.mp3")
+                    spans = stitch_chunks(chunk_paths, stitched_path)
+                    with open(stitched_path, "rb") as f:
+                        audio_bytes = f.read()
+
+                sentence_timestamps = [
+                    {"index": i, "text": text, "start": start, "end": end}
+                    for i, (text, (start, end)) in enumerate(zip(sentences, spans))
+                ]
+            except Exception as e:
+                print(f"⚠️ Chunked voiceover failed ({e}). Falling back to a single request...")
 
-        # 3. Consume the generator to get the full audio file in memory
-        audio_bytes = b"".join(audio_generator)
+        if audio_bytes is None:
+            # 3. One request for the whole script (no sentence timestamps)
+            audio_bytes = synthesize_script(client, script_text, voice_id)
         
-        file_name = "voiceover.mp3"
+        file_name = job_object_name(job_id, "voiceover.mp3")
 
         # 4. Upload to MinIO
         print(f"Uploading '{file_name}' ({len(audio_bytes)} bytes) to MinIO...")
@@ -132,11 +348,15 @@ def generate_audio_task(script_text: str) -> dict:
             length=len(audio_bytes),
             content_type='audio/mpeg'
         )
+        record_artifacts(minio_client, job_id, "voiceover", produced=[file_name])
         
-        asset_url = f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{file_name}"
+        asset_url = _asset_url(file_name)
         print(f"✅ Voiceover uploaded: {asset_url}")
         
-        return {"type": "audio", "asset_url": asset_url}
+        result = {"type": "audio", "asset_url": asset_url}
+        if sentence_timestamps:
+            result["sentence_timestamps"] = sentence_timestamps
+        return result
 
     except Exception as e:
         print(f"❌ Audio generation failed: {e}")
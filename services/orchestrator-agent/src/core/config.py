@@ -26,6 +26,13 @@ class Settings(BaseSettings):
     
     CREATIVE_AGENT_URL: Optional[str] = Field(default=None)
 
+    # --- Post-production ---
+    # Renders beyond the worker's slots wait in the broker. A render that has
+    # not started within the queue timeout expires unrun; one that has started
+    # gets the full render timeout on top.
+    POST_PRODUCTION_QUEUE_TIMEOUT_SECONDS: int = Field(default=600)
+    POST_PRODUCTION_RENDER_TIMEOUT_SECONDS: int = Field(default=300)
+
     # This tells Pydantic to look for a .env file.
     # Docker Compose's `env_file` makes this redundant but it's good practice.
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
@@ -1,8 +1,13 @@
 # services/orchestrator-agent/src/main.py
 
-from fastapi import FastAPI
+import time
+import uuid
+from typing import Literal
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from .workflow.graph import graph_app
+from .workflow.celery_client import celery_app
 
 # Create an instance of the FastAPI application
 app = FastAPI(
@@ -14,6 +19,9 @@ app = FastAPI(
 # Pydantic model to define the structure of the request body for creating a job
 class JobRequest(BaseModel):
     prompt: str
+    # "similar" lets scenes reuse a close-enough clip from the clip library
+    # instead of generating a new one with Veo.
+    reuse_policy: Literal["never", "similar"] = "never"
 
 @app.get("/", tags=["Status"])
 def health_check():
@@ -31,7 +39,13 @@ def create_job(request: JobRequest):
     print(f"🚀 Received new job request with prompt: '{request.prompt}'")
     
     # The initial state for our graph
-    initial_state = {"prompt": request.prompt}
+    # Every object a job writes is stored under its job id (jobs/<job_id>/...).
+    # The date prefix tells the GC which finals/<yyyy>/<mm>/ folder a job ends up in.
+    initial_state = {
+        "job_id": f"{time.strftime('%Y%m%d', time.gmtime())}-{uuid.uuid4().hex}",
+        "prompt": request.prompt,
+        "reuse_policy": request.reuse_policy,
+    }
     
     # Invoke the LangGraph workflow. This will run the entire process
     # from the creative planner to post-production, based on our graph definition.
@@ -40,4 +54,37 @@ def create_job(request: JobRequest):
     print(f"✅ Workflow finished. Final video URL: {final_state.get('final_video_url')}")
     
     # Return the final state of the workflow
-    return final_state
\ No newline at end of file
+    return final_state
+
+@app.get("/stats/hedging", tags=["Stats"])
+def hedging_stats():
+    """
+    Returns p50/p95/p99 latency per scene render and per job (total Veo render
+    time of its scenes) with hedged Veo renders against the unhedged baseline,
+    and the extra operations spent on hedges.
+
+    Stats are kept per asset worker node and are read by the node's
+    artifact-gc worker, so with several nodes this is one node's view only.
+    It runs on 'gc_queue' so that busy asset workers never delay it.
+    """
+    task = celery_app.send_task("hedge_stats_task", queue='gc_queue')
+    try:
+        return task.get(timeout=30)
+    except CeleryTimeoutError:
+        raise HTTPException(status_code=503, detail="Stats worker is busy, try again shortly")
+
+@app.get("/jobs/{job_id}/artifacts", tags=["Jobs"])
+def job_artifacts(job_id: str):
+    """
+    Returns the current URLs of a job's deliverables.
+
+    After GC_INTERMEDIATE_TTL_SECONDS the artifact GC moves them from
+    jobs/<job_id>/ to finals/<yyyy>/<mm>/<job_id>/, so the URLs returned by
+    POST /jobs stop working; this endpoint always points at the live copy.
+    Like the hedging stats, it runs on 'gc_queue'.
+    """
+    task = celery_app.send_task("resolve_job_artifacts_task", args=[job_id], queue='gc_queue')
+    try:
+        return task.get(timeout=30)
+    except CeleryTimeoutError:
+        raise HTTPException(status_code=503, detail="Artifact worker is busy, try again shortly")
\ No newline at end of file
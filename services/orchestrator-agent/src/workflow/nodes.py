@@ -32,8 +32,11 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
 
     storyboard = state.get("storyboard")
     script_text = state.get("script", "") # Get the script text
+    reuse_policy = state.get("reuse_policy") or "never"
+    job_id = state.get("job_id")
     
     asset_urls = {}
+    voiceover_timestamps = None
     errors = []
 
     # 1. Generate Video Assets Sequentially
@@ -46,6 +49,7 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
             video_task = celery_app.signature(
                 "generate_asset_task", 
                 args=[scene['scene_number'], scene.get('visual_description', '')],
+                kwargs={"reuse_policy": reuse_policy, "job_id": job_id},
                 queue='asset_queue' 
             )
             # Execute synchronously (wait for result)
@@ -56,7 +60,10 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
                 print(f"❌ {error_message}")
                 errors.append(error_message)
             elif res and "asset_url" in res:
-                print(f"✅ Scene {scene['scene_number']} generated: {res['asset_url']}")
+                if res.get("reused_from"):
+                    print(f"♻️ Scene {scene['scene_number']} reused library clip: {res['asset_url']}")
+                else:
+                    print(f"✅ Scene {scene['scene_number']} generated: {res['asset_url']}")
                 asset_urls[f"scene_{res['scene_number']}_video"] = res['asset_url']
                 
         except Exception as e:
@@ -71,6 +78,7 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
             audio_task = celery_app.signature(
                 "generate_audio_task",
                 args=[script_text],
+                kwargs={"job_id": job_id},
                 queue='asset_queue'
             )
             res = audio_task.apply_async().get(timeout=120)
@@ -82,6 +90,7 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
             elif res and res.get("type") == "audio":
                 print(f"✅ Audio generated: {res['asset_url']}")
                 asset_urls["voiceover_audio"] = res['asset_url']
+                voiceover_timestamps = res.get("sentence_timestamps")
                 
         except Exception as e:
             error_message = f"Audio generation exception: {str(e)}"
@@ -92,7 +101,7 @@ def asset_generator_node(state: VideoGenerationState) -> dict:
         return {"error_message": "Asset generation errors: " + " | ".join(errors)}
     
     print(f"✅ All assets generated. Total files: {len(asset_urls)}")
-    return {"asset_urls": asset_urls}
+    return {"asset_urls": asset_urls, "voiceover_timestamps": voiceover_timestamps}
 
 # --- NODE 3: POST PRODUCTION (Unchanged logic, just standard) ---
 def post_production_node(state: VideoGenerationState) -> dict:
@@ -100,19 +109,33 @@ def post_production_node(state: VideoGenerationState) -> dict:
     if state.get("error_message"): return {}
     
     asset_urls = state.get("asset_urls")
+    voiceover_timestamps = state.get("voiceover_timestamps")
     
     print("Dispatching post-production task...")
     task = celery_app.send_task(
         "post_production_task", 
         args=[asset_urls], 
-        queue='post_production_queue'
+        kwargs={"voiceover_timestamps": voiceover_timestamps, "job_id": state.get("job_id")},
+        queue='post_production_queue',
+        # The worker discards the render if no slot frees up before we stop waiting for it.
+        expires=settings.POST_PRODUCTION_QUEUE_TIMEOUT_SECONDS
     )
     
     print("Waiting for post-production to complete...")
-    result = task.get(timeout=300)
+    try:
+        result = task.get(
+            timeout=settings.POST_PRODUCTION_QUEUE_TIMEOUT_SECONDS + settings.POST_PRODUCTION_RENDER_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        print(f"❌ ERROR: Post-production did not complete: {e}")
+        return {"error_message": f"Post-production did not complete: {e}"}
     
     if result and "error" in result:
          return {"error_message": result["error"]}
 
     print(f"✅ Post-production finished.")
-    return {"final_video_url": result.get("final_video_url")}
\ No newline at end of file
+    return {
+        "final_video_url": result.get("final_video_url"),
+        "thumbnail_urls": result.get("thumbnail_urls", []),
+        "subtitles_url": result.get("subtitles_url"),
+    }
\ No newline at end of file
@@ -4,7 +4,11 @@ class VideoGenerationState(TypedDict):
     """
     Represents the state of a single video generation job.
     """
+    job_id: str
     prompt: str
+
+    # Whether scenes may reuse clips from the clip library ("never" or "similar")
+    reuse_policy: Optional[str]
     
     # The script text generated by Gemini
     script: Optional[str]
@@ -14,6 +18,12 @@ class VideoGenerationState(TypedDict):
     
     # Dictionary holding URLs for video clips AND the voiceover audio
     asset_urls: Dict[str, str]
+
+    # Per-sentence voiceover timings (chunked voiceover mode only)
+    voiceover_timestamps: Optional[List[Dict]]
     
     final_video_url: Optional[str]
+    # One small preview frame per scene, in scene order
+    thumbnail_urls: Optional[List[str]]
+    subtitles_url: Optional[str]
     error_message: Optional[str]
\ No newline at end of file
@@ -0,0 +1,83 @@
+# services/post-production-agent/src/benchmark.py
+"""
+Render throughput benchmark for the post-production worker.
+
+Renders synthetic ads through the same code path as 'post_production_task'
+(minus MinIO) and reports renders per hour for this node.
+
+Run inside the post-production container:
+    python -m src.benchmark --renders 8 --clips 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .services.render_executor import render_executor
+from .tasks import render_advertisement
+
+
+def make_sample_clip(path: str, seconds: int):
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=24:duration={seconds}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", path
+    ], check=True, capture_output=True)
+
+
+def make_sample_audio(path: str, seconds: int):
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+        "-c:a", "libmp3lame", path
+    ], check=True, capture_output=True)
+
+
+def run_benchmark(renders: int, clips: int, clip_seconds: int) -> dict:
+    with tempfile.TemporaryDirectory() as sample_dir:
+        sample_clips = []
+        for i in range(clips):
+            clip_path = os.path.join(sample_dir, f"scene_{i + 1}.mp4")
+            make_sample_clip(clip_path, clip_seconds)
+            sample_clips.append(clip_path)
+        voiceover_path = os.path.join(sample_dir, "voiceover.mp3")
+        make_sample_audio(voiceover_path, clips * clip_seconds)
+        music_path = os.path.join(sample_dir, "music.mp3")
+        make_sample_audio(music_path, clips * clip_seconds)
+
+        def render_once(_):
+            with tempfile.TemporaryDirectory() as temp_dir:
+                # Each render works on its own copies, just like a real job.
+                videos = []
+                for clip_path in sample_clips:
+                    local_path = os.path.join(temp_dir, os.path.basename(clip_path))
+                    os.link(clip_path, local_path)
+                    videos.append(local_path)
+                with render_executor.render_slot():
+                    render_advertisement(temp_dir, videos, voiceover_path, music_path)
+
+        started_at = time.monotonic()
+        # Submit more renders than slots so the queueing path is exercised too.
+        with ThreadPoolExecutor(max_workers=renders) as pool:
+            list(pool.map(render_once, range(renders)))
+        wall_seconds = time.monotonic() - started_at
+
+    stats = render_executor.stats()
+    stats.update({
+        "cpu_cores": render_executor.budget.cpu_cores,
+        "memory_mb": render_executor.budget.memory_mb,
+        "wall_seconds": round(wall_seconds, 2),
+        "measured_renders_per_hour": round(renders * 3600 / wall_seconds, 1),
+    })
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark post-production render throughput.")
+    parser.add_argument("--renders", type=int, default=8)
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--clip-seconds", type=int, default=6)
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.renders, args.clips, args.clip_seconds), indent=2))
@@ -1,6 +1,7 @@
 # services/asset-generator-agent/src/celery_app.py
 from celery import Celery
 from .core.config import settings
+from .services.render_executor import render_budget
 
 # Initialize the Celery application
 celery = Celery(
@@ -12,4 +13,9 @@ celery = Celery(
 
 celery.conf.update(
     task_track_started=True,
+    # One worker process per render slot; extra renders wait in the queue
+    # instead of fighting over the node's cores.
+    worker_concurrency=render_budget.max_concurrent_renders,
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
 )
\ No newline at end of file
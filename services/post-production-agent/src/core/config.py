@@ -26,6 +26,15 @@ class Settings(BaseSettings):
     
     CREATIVE_AGENT_URL: Optional[str] = Field(default=None)
 
+    # --- Render executor ---
+    # Leave RENDER_MAX_CONCURRENT unset to derive it from the node's cores and memory.
+    RENDER_MAX_CONCURRENT: Optional[int] = Field(default=None)
+    RENDER_MIN_THREADS_PER_JOB: int = Field(default=2)
+    RENDER_MEMORY_PER_JOB_MB: int = Field(default=1024)
+    RENDER_CLIP_WORKERS: Optional[int] = Field(default=None)
+    RENDER_SLOT_DIR: str = Field(default="/tmp/render_slots")
+    RENDER_SLOT_POLL_SECONDS: float = Field(default=2.0)
+
     # This tells Pydantic to look for a .env file.
     # Docker Compose's `env_file` makes this redundant but it's good practice.
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
@@ -0,0 +1,58 @@
+# services/post-production-agent/src/services/artifacts.py
+import json
+import time
+from io import BytesIO
+from typing import Iterable, Optional
+
+from ..core.config import settings
+
+MANIFEST_PREFIX = "manifests"
+JOBS_PREFIX = "jobs"
+
+
+def job_object_name(job_id: Optional[str], file_name: str) -> str:
+    """
+    Where a job's object lives. Callers that do not pass a job id keep the
+    old bucket-root names.
+    """
+    return f"{JOBS_PREFIX}/{job_id}/{file_name}" if job_id else file_name
+
+
+def put_json(minio_client, object_name: str, payload: dict):
+    data = json.dumps(payload).encode("utf-8")
+    minio_client.put_object(
+        bucket_name=settings.S3_BUCKET_NAME,
+        object_name=object_name,
+        data=BytesIO(data),
+        length=len(data),
+        content_type='application/json'
+    )
+
+
+def record_artifacts(minio_client, job_id: Optional[str], stage: str, produced: Iterable[str] = (),
+                     finals: Iterable[str] = (), referenced: Iterable[str] = ()):
+    """
+    Writes this stage's part of the job's artifact manifest.
+
+    Every stage writes its own fragment (manifests/<job_id>/<stage>.json), so
+    tasks running in parallel never rewrite each other's entries.
+    - produced:   intermediates this stage created; collectable after the TTL
+    - finals:     deliverables; kept, and compacted into finals/ after the TTL
+    - referenced: objects owned by someone else (e.g. clip library entries)
+
+    Best-effort: an object missing from every manifest is simply never touched
+    by the garbage collector, so a failed write must not fail the stage.
+    """
+    if not job_id:
+        return
+    try:
+        put_json(minio_client, f"{MANIFEST_PREFIX}/{job_id}/{stage}.json", {
+            "job_id": job_id,
+            "stage": stage,
+            "created_at": time.time(),
+            "produced": list(produced),
+            "finals": list(finals),
+            "referenced": list(referenced),
+        })
+    except Exception as e:
+        print(f"⚠️ Could not record artifacts for job {job_id} ({stage}): {e}")
@@ -0,0 +1,200 @@
+# services/post-production-agent/src/services/render_executor.py
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from ..core.config import settings
+
+
+@dataclass(frozen=True)
+class RenderBudget:
+    """
+    How much of the node a single render is allowed to use.
+    """
+    cpu_cores: int
+    memory_mb: int
+    max_concurrent_renders: int
+    ffmpeg_threads: int
+    filter_threads: int
+    clip_workers: int
+
+
+def detect_cpu_cores() -> int:
+    """
+    Returns the number of cores this container may actually use.
+    A Docker '--cpus' quota (cgroup v2 cpu.max) wins over the host's core count.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cores)
+
+
+def detect_memory_mb() -> int:
+    """
+    Returns the memory available to this container in MB (cgroup limit if set).
+    """
+    memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            memory_mb = min(memory_mb, int(limit) // (1024 * 1024))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, memory_mb)
+
+
+def compute_render_budget(cpu_cores: int, memory_mb: int) -> RenderBudget:
+    """
+    Splits the node between concurrent renders so that the ffmpeg processes
+    together never ask for more threads than there are cores.
+    """
+    by_cpu = max(1, cpu_cores // settings.RENDER_MIN_THREADS_PER_JOB)
+    by_memory = max(1, memory_mb // settings.RENDER_MEMORY_PER_JOB_MB)
+    max_concurrent = settings.RENDER_MAX_CONCURRENT or min(by_cpu, by_memory)
+
+    ffmpeg_threads = max(1, cpu_cores // max_concurrent)
+
+    return RenderBudget(
+        cpu_cores=cpu_cores,
+        memory_mb=memory_mb,
+        max_concurrent_renders=max_concurrent,
+        ffmpeg_threads=ffmpeg_threads,
+        # Filtering and encoding run side by side, so they share the budget.
+        filter_threads=max(1, ffmpeg_threads // 2),
+        # Per-clip steps are single-threaded ffmpeg runs, one per worker.
+        clip_workers=settings.RENDER_CLIP_WORKERS or ffmpeg_threads,
+    )
+
+
+class RenderExecutor:
+    """
+    Gives each render a slice of the node and queues renders beyond capacity.
+
+    Celery prefork runs every task in its own process, so render slots are
+    file locks shared by all worker processes on the node rather than an
+    in-process semaphore.
+    """
+
+    def __init__(self, budget: RenderBudget, slot_dir: Optional[str] = None):
+        self.budget = budget
+        self.slot_dir = slot_dir or settings.RENDER_SLOT_DIR
+        self._lock = threading.Lock()
+        self._renders_completed = 0
+        self._render_seconds = 0.0
+        self._queue_seconds = 0.0
+
+    # --- FFMPEG ARGUMENTS ---
+    def global_args(self) -> List[str]:
+        """Global options; must come right after 'ffmpeg'."""
+        return [
+            "-filter_threads", str(self.budget.filter_threads),
+            "-filter_complex_threads", str(self.budget.filter_threads),
+        ]
+
+    def output_args(self) -> List[str]:
+        """Output options; must come right before the output path."""
+        return ["-threads", str(self.budget.ffmpeg_threads)]
+
+    def clip_args(self) -> List[str]:
+        """Thread options for one per-clip step running inside the clip pool."""
+        return ["-threads", "1"]
+
+    # --- SCHEDULING ---
+    @contextmanager
+    def render_slot(self):
+        """
+        Blocks until one of the node's render slots is free, then holds it.
+        """
+        os.makedirs(self.slot_dir, exist_ok=True)
+        queued_at = time.monotonic()
+        announced = False
+
+        while True:
+            for slot in range(self.budget.max_concurrent_renders):
+                fd = os.open(os.path.join(self.slot_dir, f"slot_{slot}.lock"), os.O_CREAT | os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+
+                waited = time.monotonic() - queued_at
+                started_at = time.monotonic()
+                try:
+                    yield slot
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                    self._record(waited, time.monotonic() - started_at)
+                return
+
+            if not announced:
+                print(f"⏳ All {self.budget.max_concurrent_renders} render slots busy. Queued...")
+                announced = True
+            time.sleep(settings.RENDER_SLOT_POLL_SECONDS)
+
+    def map_clips(self, fn: Callable, items: Iterable) -> list:
+        """
+        Runs an independent per-clip step over all clips in parallel.
+
+        Each step shells out to ffmpeg, so threads are enough to keep one ffmpeg
+        process per clip worker busy (prefork children are daemonic and may not
+        start a multiprocessing pool of their own).
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.budget.clip_workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    # --- STATS ---
+    def _record(self, queue_seconds: float, render_seconds: float):
+        with self._lock:
+            self._renders_completed += 1
+            self._queue_seconds += queue_seconds
+            self._render_seconds += render_seconds
+
+    def stats(self) -> dict:
+        """
+        Render throughput of this process, projected to the whole node.
+        """
+        with self._lock:
+            completed = self._renders_completed
+            mean_render = self._render_seconds / completed if completed else 0.0
+            mean_queue = self._queue_seconds / completed if completed else 0.0
+
+        renders_per_hour = (
+            self.budget.max_concurrent_renders * 3600 / mean_render if mean_render else 0.0
+        )
+        return {
+            "renders_completed": completed,
+            "mean_render_seconds": round(mean_render, 2),
+            "mean_queue_seconds": round(mean_queue, 2),
+            "max_concurrent_renders": self.budget.max_concurrent_renders,
+            "ffmpeg_threads": self.budget.ffmpeg_threads,
+            "filter_threads": self.budget.filter_threads,
+            "renders_per_hour_per_node": round(renders_per_hour, 1),
+        }
+
+
+render_budget = compute_render_budget(detect_cpu_cores(), detect_memory_mb())
+render_executor = RenderExecutor(render_budget)
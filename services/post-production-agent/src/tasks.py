@@ -2,11 +2,14 @@ import subprocess
 import tempfile
 import os
 import random
+import re
 from io import BytesIO
 from urllib.parse import urlparse
 from minio import Minio
 from .celery_app import celery
 from .core.config import settings
+from .services.render_executor import render_executor
+from .services.artifacts import job_object_name, record_artifacts
 
 # --- INITIALIZE CLIENT ---
 try:
@@ -21,8 +24,125 @@ except Exception as e:
     print(f"❌ Failed to initialize MinIO client: {e}")
     minio_client = None
 
+# --- PER-CLIP STEPS (run in parallel through the render executor) ---
+def normalize_clip(clip_path: str) -> str:
+    """
+    Remuxes a clip with regenerated timestamps so the concat demuxer can join it
+    without re-encoding.
+    """
+    normalized_path = f"{os.path.splitext(clip_path)[0]}_normalized.mp4"
+    subprocess.run([
+        "ffmpeg", "-y", "-fflags", "+genpts", "-i", clip_path,
+        "-c", "copy", "-avoid_negative_ts", "make_zero", "-movflags", "+faststart",
+        *render_executor.clip_args(), normalized_path
+    ], check=True, capture_output=True)
+    return normalized_path
+
+def extract_thumbnail(clip_path: str) -> str:
+    """
+    Grabs a small representative frame from the start of a clip.
+    Thumbnails are optional, so this returns None instead of raising.
+    """
+    thumbnail_path = f"{os.path.splitext(clip_path)[0]}_thumb.jpg"
+    try:
+        # The 'thumbnail' filter picks from the first frames, so it works for clips of any length.
+        subprocess.run([
+            "ffmpeg", "-y", "-i", clip_path,
+            "-frames:v", "1", "-vf", "thumbnail,scale=320:-2",
+            *render_executor.clip_args(), thumbnail_path
+        ], check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ Could not extract thumbnail from {os.path.basename(clip_path)}: {e}")
+        return None
+    return thumbnail_path if os.path.exists(thumbnail_path) else None
+
+def prepare_clip(clip_path: str) -> tuple:
+    normalized_path, thumbnail_path = normalize_clip(clip_path), extract_thumbnail(clip_path)
+    # The original is no longer needed; don't keep two copies of every clip on disk.
+    os.remove(clip_path)
+    return normalized_path, thumbnail_path
+
+def render_advertisement(temp_dir: str, video_paths: list, voiceover_path: str = None, bg_music_path: str = None) -> tuple:
+    """
+    Builds the final advertisement from local clips and audio.
+    Returns the path of the final video and the clip thumbnails.
+    """
+    # --- PREPARE CLIPS (independent per clip, so run them side by side) ---
+    prepared = render_executor.map_clips(prepare_clip, video_paths)
+    normalized_videos = [normalized for normalized, _ in prepared]
+    thumbnail_paths = [thumbnail for _, thumbnail in prepared if thumbnail]
+
+    # --- CONCATENATE VIDEOS (Create visual track) ---
+    manifest_path = os.path.join(temp_dir, "mylist.txt")
+    with open(manifest_path, 'w') as f:
+        for file_path in normalized_videos:
+            f.write(f"file '{file_path}'\n")
+    
+    silent_video_path = os.path.join(temp_dir, "silent_combined.mp4")
+    subprocess.run([
+        "ffmpeg", *render_executor.global_args(), "-f", "concat", "-safe", "0", "-i", manifest_path, 
+        "-c", "copy", *render_executor.output_args(), silent_video_path
+    ], check=True, capture_output=True)
+
+    # --- MIX AUDIO AND VIDEO ---
+    final_output_path = os.path.join(temp_dir, "final_advertisement.mp4")
+    
+    # Base command: Input 0 is Video
+    ffmpeg_cmd = ["ffmpeg", *render_executor.global_args(), "-i", silent_video_path]
+    
+    if voiceover_path and bg_music_path:
+        print("Merging: Video + Voiceover + Background Music")
+        # Input 1: Voice, Input 2: Music
+        ffmpeg_cmd.extend(["-i", voiceover_path, "-i", bg_music_path])
+        
+        # Filter Logic:
+        # [2:a]volume=0.1[bg] -> Lower music volume to 10%
+        # [1:a][bg]amix...    -> Mix Voice and lowered Music
+        # -map 0:v -> Use video from Input 0
+        # -map [aout] -> Use mixed audio
+        # -shortest -> Cut music when video ends
+        ffmpeg_cmd.extend([
+            "-filter_complex", "[2:a]volume=0.1[bg];[1:a][bg]amix=inputs=2:duration=longest[aout]",
+            "-map", "0:v", "-map", "[aout]",
+            "-c:v", "copy", "-c:a", "aac", "-shortest",
+            *render_executor.output_args(), final_output_path
+        ])
+        
+    elif voiceover_path:
+        print("Merging: Video + Voiceover")
+        ffmpeg_cmd.extend(["-i", voiceover_path])
+        ffmpeg_cmd.extend([
+            "-c:v", "copy", "-c:a", "aac", "-map", "0:v", "-map", "1:a", "-shortest",
+            *render_executor.output_args(), final_output_path
+        ])
+    else:
+        print("Merging: Video Only")
+        os.rename(silent_video_path, final_output_path)
+        ffmpeg_cmd = None
+
+    if ffmpeg_cmd:
+        subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+
+    return final_output_path, thumbnail_paths
+
+def _srt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def write_subtitles(voiceover_timestamps: list, path: str) -> str:
+    """
+    Writes per-sentence voiceover timings as an SRT file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, sentence in enumerate(voiceover_timestamps, start=1):
+            f.write(f"{i}\n{_srt_time(sentence['start'])} --> {_srt_time(sentence['end'])}\n{sentence['text']}\n\n")
+    return path
+
 @celery.task(name="post_production_task")
-def post_production_task(asset_urls: dict) -> dict:
+def post_production_task(asset_urls: dict, voiceover_timestamps: list = None, job_id: str = None) -> dict:
     print(f"✂️ Starting post-production with {len(asset_urls)} assets.")
 
     if not minio_client:
@@ -51,8 +171,10 @@ def post_production_task(asset_urls: dict) -> dict:
             
             # --- 2. DOWNLOAD ASSETS ---
             for key, url in asset_urls.items():
-                object_name = url.split('/')[-1]
-                local_path = os.path.join(temp_dir, object_name)
+                # Objects may live under a prefix (e.g. reused 'library/...' clips),
+                # so take everything after the bucket, and name the local copy by key.
+                object_name = urlparse(url).path.lstrip('/').split('/', 1)[1]
+                local_path = os.path.join(temp_dir, f"{key}{os.path.splitext(object_name)[1]}")
                 
                 print(f"Downloading {object_name}...")
                 minio_client.fget_object(
@@ -65,63 +187,40 @@ def post_production_task(asset_urls: dict) -> dict:
                 if key == "voiceover_audio":
                     voiceover_path = local_path
                 else:
-                    downloaded_videos.append(local_path)
+                    downloaded_videos.append((key, local_path))
 
-            # Sort videos by scene number (keys usually 'scene_1', 'scene_2'...)
-            downloaded_videos.sort()
+            # Sort videos by scene number (keys usually 'scene_1_video', 'scene_2_video'...)
+            downloaded_videos.sort(key=lambda item: int(re.search(r"\d+", item[0]).group()))
+            downloaded_videos = [local_path for _, local_path in downloaded_videos]
 
-            # --- 3. CONCATENATE VIDEOS (Create visual track) ---
-            manifest_path = os.path.join(temp_dir, "mylist.txt")
-            with open(manifest_path, 'w') as f:
-                for file_path in downloaded_videos:
-                    f.write(f"file '{file_path}'\n")
-            
-            silent_video_path = os.path.join(temp_dir, "silent_combined.mp4")
-            subprocess.run([
-                "ffmpeg", "-f", "concat", "-safe", "0", "-i", manifest_path, 
-                "-c", "copy", silent_video_path
-            ], check=True, capture_output=True)
-
-            # --- 4. MIX AUDIO AND VIDEO ---
-            final_output_path = os.path.join(temp_dir, "final_advertisement.mp4")
-            
-            # Base command: Input 0 is Video
-            ffmpeg_cmd = ["ffmpeg", "-i", silent_video_path]
-            
-            if voiceover_path and bg_music_path:
-                print("Merging: Video + Voiceover + Background Music")
-                # Input 1: Voice, Input 2: Music
-                ffmpeg_cmd.extend(["-i", voiceover_path, "-i", bg_music_path])
-                
-                # Filter Logic:
-                # [2:a]volume=0.1[bg] -> Lower music volume to 10%
-                # [1:a][bg]amix...    -> Mix Voice and lowered Music
-                # -map 0:v -> Use video from Input 0
-                # -map [aout] -> Use mixed audio
-                # -shortest -> Cut music when video ends
-                ffmpeg_cmd.extend([
-                    "-filter_complex", "[2:a]volume=0.1[bg];[1:a][bg]amix=inputs=2:duration=longest[aout]",
-                    "-map", "0:v", "-map", "[aout]",
-                    "-c:v", "copy", "-c:a", "aac", "-shortest",
-                    final_output_path
-                ])
-                
-            elif voiceover_path:
-                print("Merging: Video + Voiceover")
-                ffmpeg_cmd.extend(["-i", voiceover_path])
-                ffmpeg_cmd.extend([
-                    "-c:v", "copy", "-c:a", "aac", "-map", "0:v", "-map", "1:a", "-shortest", final_output_path
-                ])
-            else:
-                print("Merging: Video Only")
-                os.rename(silent_video_path, final_output_path)
-                ffmpeg_cmd = None
+            # --- 3. RENDER (waits for a free render slot on this node) ---
+            with render_executor.render_slot():
+                final_output_path, thumbnail_paths = render_advertisement(
+                    temp_dir, downloaded_videos, voiceover_path, bg_music_path
+                )
+            print(f"📊 Render stats: {render_executor.stats()}")
 
-            if ffmpeg_cmd:
-                subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+            # --- 4. UPLOAD THUMBNAILS ---
+            thumbnail_urls = []
+            thumbnail_names = []
+            for thumbnail_path in thumbnail_paths:
+                thumbnail_name = job_object_name(job_id, os.path.basename(thumbnail_path))
+                try:
+                    minio_client.fput_object(
+                        bucket_name=settings.S3_BUCKET_NAME,
+                        object_name=thumbnail_name,
+                        file_path=thumbnail_path,
+                        content_type='image/jpeg'
+                    )
+                except Exception as e:
+                    # A missing thumbnail must never fail the render.
+                    print(f"⚠️ Could not upload thumbnail {thumbnail_name}: {e}")
+                    continue
+                thumbnail_names.append(thumbnail_name)
+                thumbnail_urls.append(f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{thumbnail_name}")
 
             # --- 5. UPLOAD FINAL VIDEO ---
-            final_file_name = "final_advertisement.mp4"
+            final_file_name = job_object_name(job_id, "final_advertisement.mp4")
             file_stat = os.stat(final_output_path)
             
             with open(final_output_path, 'rb') as f:
@@ -135,9 +234,35 @@ def post_production_task(asset_urls: dict) -> dict:
 
             final_url = f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{final_file_name}"
             print(f"✅ Final video uploaded: {final_url}")
+
+            result = {"final_video_url": final_url, "thumbnail_urls": thumbnail_urls}
+            # Thumbnail URLs are handed back to the caller, so they live as long as the video.
+            finals = [final_file_name] + thumbnail_names
+
+            # --- 6. UPLOAD SUBTITLES (free when the voiceover came with sentence timings) ---
+            if voiceover_timestamps:
+                subtitles_name = job_object_name(job_id, "final_advertisement.srt")
+                try:
+                    subtitles_path = write_subtitles(voiceover_timestamps, os.path.join(temp_dir, "final_advertisement.srt"))
+                    minio_client.fput_object(
+                        bucket_name=settings.S3_BUCKET_NAME,
+                        object_name=subtitles_name,
+                        file_path=subtitles_path,
+                        content_type='application/x-subrip'
+                    )
+                except Exception as e:
+                    # The final video is already uploaded; missing subtitles must not fail (or orphan) it.
+                    print(f"⚠️ Could not upload subtitles {subtitles_name}: {e}")
+                else:
+                    result["subtitles_url"] = f"http://localhost:9000/{settings.S3_BUCKET_NAME}/{subtitles_name}"
+                    print(f"✅ Subtitles uploaded: {result['subtitles_url']}")
+                    finals.append(subtitles_name)
+
+            # --- 7. RECORD ARTIFACTS (everything this stage returns is a final) ---
+            record_artifacts(minio_client, job_id, "post_production", finals=finals)
             
-            return {"final_video_url": final_url}
+            return result
 
         except Exception as e:
             print(f"❌ Post-production error: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}